@@ -1,60 +1,243 @@
 #!/usr/bin/env python3
 import argparse
-import json
+import fcntl
 import os
-import re
+import random
+import stat
 import sys
-from datetime import datetime, timezone, timedelta
+import tempfile
+import time
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from functools import lru_cache, partial
 from pathlib import Path
 
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
+# boto3/botocore are imported lazily: the common "token still valid" path
+# never needs them, and importing boto3 is a large share of cold-start time.
+
+# Keep connections alive and bound how long a flaky network can stall a refresh.
+_BOTO_CFG_OPTS = dict(
+    tcp_keepalive=True,
+    connect_timeout=3,
+    read_timeout=10,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+)
+
+# (token path, mtime_ns) -> expiration as a Unix epoch. Lets the "still valid"
+# check skip reading and parsing the token file when it hasn't changed.
+_EXPIRY_CACHE: dict[tuple[str, int], float] = {}
+
+_CAPABILITY_CHOICES = ["PUBLISH", "SUBSCRIBE"]
+_DEFAULT_CAPS = ("PUBLISH", "SUBSCRIBE")
+
+# STS caller identity is cached on disk so retry loops don't repeat the lookup.
+_IDENTITY_CACHE_TTL = 12 * 3600
+
+
+@lru_cache(maxsize=None)
+def _json_codec():
+    """
+    Return (loads, dumps) for token JSON, preferring orjson over stdlib json.
+    Imported on first use so the cached-expiry fast path loads neither.
+    """
+    try:
+        import orjson
+    except ImportError:
+        import json
+
+        return json.loads, lambda obj: json.dumps(obj, indent=2).encode()
+    return orjson.loads, partial(orjson.dumps, option=orjson.OPT_INDENT_2)
+
+
+@lru_cache(maxsize=None)
+def _session(region: str | None):
+    """Return a boto3 Session for the region, resolving credentials only once."""
+    import boto3
+
+    return boto3.session.Session(region_name=region or None)
+
+
+@lru_cache(maxsize=None)
+def _client(service: str, region: str | None):
+    """Return a cached boto3 client for (service, region)."""
+    from botocore.config import Config
+
+    return _session(region).client(service, config=Config(**_BOTO_CFG_OPTS))
 
 
 def extract_account_id_from_arn(arn: str) -> str | None:
     """Extract a 12-digit AWS account ID from a standard ARN, or return None."""
     # arn:partition:service:region:account-id:resource
-    m = re.match(r"^arn:[^:]+:[^:]+:[^:]*:(\d{12}):.+$", arn)
-    return m.group(1) if m else None
+    parts = arn.split(":", 5)
+    if (
+        len(parts) == 6
+        and parts[0] == "arn"
+        and parts[1]
+        and parts[2]
+        and len(parts[4]) == 12
+        and parts[4].isdecimal()
+        and parts[5]
+    ):
+        return parts[4]
+    return None
+
+
+def _identity_cache_path() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "soundscape" / "caller_identity.json"
+
+
+def _identity_cache_key(region: str | None) -> str:
+    """
+    Key the cached identity on where credentials come from, so editing or
+    rotating the credentials/config files (or the env keys) invalidates it.
+    """
+    parts = [
+        os.environ.get("AWS_PROFILE", "default"),
+        region or "default",
+        os.environ.get("AWS_ACCESS_KEY_ID", ""),
+    ]
+    for var, default in (
+        ("AWS_SHARED_CREDENTIALS_FILE", "~/.aws/credentials"),
+        ("AWS_CONFIG_FILE", "~/.aws/config"),
+    ):
+        path = os.path.expanduser(os.environ.get(var, default))
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime_ns = 0
+        parts.append(f"{path}@{mtime_ns}")
+    return ":".join(parts)
+
+
+def _load_identity_cache(path: Path) -> dict:
+    try:
+        loads, _ = _json_codec()
+        entries = loads(path.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    return entries if isinstance(entries, dict) else {}
 
 
 def try_print_caller_identity(region: str | None):
-    """Best-effort print of the active AWS identity (useful for debugging auth)."""
+    """
+    Best-effort print of the active AWS identity (useful for debugging auth).
+    Results are cached per credential source + region for 12 hours.
+    """
+    key = cache_path = None
+    entries = {}
+    try:
+        key = _identity_cache_key(region)
+        cache_path = _identity_cache_path()
+        entries = _load_identity_cache(cache_path)
+        cached = entries.get(key)
+        if cached is not None and time.time() - float(cached["cachedAt"]) < _IDENTITY_CACHE_TTL:
+            print(
+                f"AWS caller identity (cached, STS not called): Account={cached.get('Account')} "
+                f"Arn={cached.get('Arn')} UserId={cached.get('UserId')}"
+            )
+            return cached
+    except Exception:
+        # Any problem with the cache (unreadable, corrupt entry, no HOME) is a miss.
+        pass
+
     try:
-        session_kwargs = {}
-        if region:
-            session_kwargs["region_name"] = region
-        sts = boto3.client("sts", **session_kwargs)
+        sts = _client("sts", region)
         ident = sts.get_caller_identity()
         arn = ident.get("Arn")
         account = ident.get("Account")
         user_id = ident.get("UserId")
         print(f"AWS caller identity: Account={account} Arn={arn} UserId={user_id}")
-        return ident
     except Exception as e:
         print(f"(debug) Unable to fetch AWS caller identity via STS: {e}")
         return None
 
+    if key is not None and cache_path is not None:
+        now = time.time()
+        try:
+            # Drop expired/corrupt entries (e.g. from since-rotated credentials).
+            entries = {
+                k: v
+                for k, v in entries.items()
+                if isinstance(v, dict) and now - float(v.get("cachedAt", 0)) < _IDENTITY_CACHE_TTL
+            }
+        except (TypeError, ValueError):
+            entries = {}
+        entries[key] = {"Account": account, "Arn": arn, "UserId": user_id, "cachedAt": now}
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            _, dumps = _json_codec()
+            cache_path.write_bytes(dumps(entries))
+        except (OSError, TypeError):
+            pass
+    return ident
+
 
 def load_existing_token(path: Path):
-    """Return (meta_dict, raw_contents) or (None, None) if missing/invalid."""
-    if not path.exists():
+    """Return (meta_dict, raw_bytes) or (None, None) if missing/invalid."""
+    try:
+        raw = path.read_bytes().strip()
+    except FileNotFoundError:
         return None, None
 
-    raw = path.read_text().strip()
     try:
-        meta = json.loads(raw)
+        loads, _ = _json_codec()
+        meta = loads(raw)
         # must at least have token + expirationTime
         if "token" in meta and "expirationTime" in meta:
             return meta, raw
-    except json.JSONDecodeError:
+    except ValueError:  # JSONDecodeError (json/orjson) or non-UTF-8 bytes
         pass
 
     # Unknown / legacy format; treat as expired but preserve contents for rename
     return None, raw
 
 
-def is_token_valid(meta: dict, safety_margin_seconds: int = 300) -> bool:
+@lru_cache(maxsize=128)
+def _parse_iso(s: str) -> datetime:
+    """Parse an ISO 8601 timestamp, assuming UTC when no offset is given."""
+    dt = datetime.fromisoformat(s)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def load_cached_expiry(path: Path, mtime_ns: int) -> float | None:
+    """
+    Return the cached expiration epoch for this exact version of the token file,
+    or None on a miss. Falls back to the <token>.expiry sidecar so the cache is
+    shared across invocations.
+    """
+    key = (str(path), mtime_ns)
+    exp_ts = _EXPIRY_CACHE.get(key)
+    if exp_ts is not None:
+        return exp_ts
+
+    try:
+        cached_mtime, cached_exp = path.with_suffix(".expiry").read_text().split()
+        if int(cached_mtime) != mtime_ns:
+            return None
+        exp_ts = float(cached_exp)
+    except (OSError, ValueError):
+        return None
+
+    _EXPIRY_CACHE[key] = exp_ts
+    return exp_ts
+
+
+def store_cached_expiry(path: Path, mtime_ns: int, meta: dict):
+    """Best-effort record of the token's expiration epoch for load_cached_expiry."""
+    try:
+        exp_ts = _parse_iso(meta["expirationTime"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return
+
+    _EXPIRY_CACHE[(str(path), mtime_ns)] = exp_ts
+    try:
+        path.with_suffix(".expiry").write_text(f"{mtime_ns} {exp_ts}\n")
+    except OSError:
+        pass
+
+
+def is_token_valid(meta: dict, safety_margin_seconds: float = 300) -> bool:
     """
     Returns True if token is still valid, with a safety margin.
     meta["expirationTime"] is ISO 8601 string from IVS.
@@ -65,7 +248,7 @@ def is_token_valid(meta: dict, safety_margin_seconds: int = 300) -> bool:
         # as a string we parse it here.
         if isinstance(exp, str):
             # Handles formats like '2025-12-11T10:30:00+00:00'
-            expiration = datetime.fromisoformat(exp)
+            expiration = _parse_iso(exp)
         elif isinstance(exp, datetime):
             expiration = exp
         else:
@@ -74,27 +257,40 @@ def is_token_valid(meta: dict, safety_margin_seconds: int = 300) -> bool:
         if expiration.tzinfo is None:
             expiration = expiration.replace(tzinfo=timezone.utc)
 
-        now = datetime.now(timezone.utc)
-        return now + timedelta(seconds=safety_margin_seconds) < expiration
+        return time.time() + safety_margin_seconds < expiration.timestamp()
     except Exception:
         return False
 
 
+def acquire_refresh_lock(path: Path):
+    """
+    Take an exclusive flock on <token>.lock, held until the process exits, so
+    concurrent triggers don't both call IVS. Best-effort: no-op if the lock file
+    can't be opened.
+    """
+    try:
+        fd = os.open(path.with_suffix(".lock"), os.O_CREAT | os.O_RDWR, 0o600)
+    except OSError:
+        return
+
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        print("Another token refresh is in progress; waiting for it...")
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+
 def create_new_token(
     stage_arn: str,
     duration_minutes: int,
     region: str | None,
     user_id: str | None,
-    capabilities: list[str] | None,
+    capabilities: Sequence[str] | None,
 ) -> dict:
     """
     Calls IVS Real-Time CreateParticipantToken and returns the participantToken dict.
     """
-    session_kwargs = {}
-    if region:
-        session_kwargs["region_name"] = region
-
-    client = boto3.client("ivs-realtime", **session_kwargs)
+    client = _client("ivs-realtime", region)
 
     kwargs = {
         "stageArn": stage_arn,
@@ -109,18 +305,18 @@ def create_new_token(
     return resp["participantToken"]
 
 
-def backup_old_file(path: Path, old_raw: str | None):
-    """Rename existing token file to token.<timestamp>.bak, preserving contents."""
+def backup_old_file(path: Path, old_raw: bytes | None):
+    """Rename existing token file to token.<epoch>.bak, preserving contents."""
     if not path.exists():
         return
-    ts = datetime.now().strftime("%Y%m%dT%H%M%S")
+    ts = f"{int(time.time())}"
     backup_path = path.with_name(f"{path.name}.{ts}.bak")
     # Either rename the file, or rewrite content (to be robust if old_raw given)
     try:
         path.rename(backup_path)
     except OSError:
         # Fallback: write backup separately
-        backup_path.write_text(old_raw or "")
+        backup_path.write_bytes(old_raw or b"")
 
 
 def write_new_token(path: Path, stage_arn: str, participant_token: dict):
@@ -135,6 +331,7 @@ def write_new_token(path: Path, stage_arn: str, participant_token: dict):
         "capabilities": [...],
         "userId": "..."
     }
+    Returns the persisted metadata dict.
     """
     # expirationTime is a datetime in boto3, convert to ISO string
     exp = participant_token.get("expirationTime")
@@ -153,7 +350,33 @@ def write_new_token(path: Path, stage_arn: str, participant_token: dict):
         "userId": participant_token.get("userId"),
     }
 
-    path.write_text(json.dumps(meta, indent=2))
+    _, dumps = _json_codec()
+    data = dumps(meta)
+
+    # Skip the write (and its fsync) if the file already holds exactly this token.
+    try:
+        if path.read_bytes() == data:
+            return meta
+    except OSError:
+        pass
+
+    # Write to a temp file in the same directory and atomically swap it in, so a
+    # crash mid-write never leaves a truncated token behind.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return meta
 
 
 def parse_args():
@@ -190,7 +413,7 @@ def parse_args():
     parser.add_argument(
         "--capability",
         action="append",
-        choices=["PUBLISH", "SUBSCRIBE"],
+        choices=_CAPABILITY_CHOICES,
         help=(
             "Optional capabilities. Specify multiple times, e.g. "
             "--capability PUBLISH --capability SUBSCRIBE. "
@@ -200,21 +423,42 @@ def parse_args():
     parser.add_argument(
         "--no-safety-margin",
         action="store_true",
-        help="Skip the 5-minute safety margin when checking expiry.",
+        help=(
+            "Skip all refresh margins (the 5-minute safety margin and the "
+            "proactive/jitter margin); refresh only once the token has expired."
+        ),
+    )
+    parser.add_argument(
+        "--proactive-fraction",
+        type=float,
+        default=0.8,
+        help=(
+            "Refresh once this fraction of --duration-minutes has elapsed, "
+            "well before expiry (0 < f <= 1; default 0.8). Use 1 to disable."
+        ),
+    )
+    parser.add_argument(
+        "--jitter-seconds",
+        type=float,
+        default=60,
+        help="Random extra refresh margin (0..N seconds) to spread refreshes across devices.",
     )
     return parser.parse_args()
 
 
-from datetime import timedelta  # import here to avoid clutter at top
-
-
 def main():
     args = parse_args()
     token_path = Path(args.token_file)
 
     # Harden: ensure the target directory exists (common case: /run/audiostream on Linux).
     # If it doesn't exist, attempt to create it; otherwise fail with a clear error.
-    if token_path.exists() and token_path.is_dir():
+    # A single stat of the token file covers the common case where it already exists.
+    try:
+        st = os.stat(token_path)
+    except (FileNotFoundError, NotADirectoryError):
+        st = None
+
+    if st is not None and stat.S_ISDIR(st.st_mode):
         print(
             f"ERROR: token-file points to a directory, not a file: {token_path}",
             file=sys.stderr,
@@ -222,25 +466,30 @@ def main():
         sys.exit(1)
 
     token_dir = token_path.parent
-    if not token_dir.exists():
+    if st is None:
         try:
-            token_dir.mkdir(parents=True, exist_ok=True)
-            print(f"Created missing directory: {token_dir}")
-        except OSError as e:
+            dir_st = os.stat(token_dir)
+        except (FileNotFoundError, NotADirectoryError):
+            dir_st = None
+
+        if dir_st is None:
+            try:
+                token_dir.mkdir(parents=True, exist_ok=True)
+                print(f"Created missing directory: {token_dir}")
+            except OSError as e:
+                print(
+                    f"ERROR: token-file directory does not exist and could not be created: {token_dir}\n"
+                    f"Reason: {e}",
+                    file=sys.stderr,
+                )
+                sys.exit(1)
+        elif not stat.S_ISDIR(dir_st.st_mode):
             print(
-                f"ERROR: token-file directory does not exist and could not be created: {token_dir}\n"
-                f"Reason: {e}",
+                f"ERROR: token-file parent is not a directory: {token_dir}",
                 file=sys.stderr,
             )
             sys.exit(1)
 
-    if not token_dir.is_dir():
-        print(
-            f"ERROR: token-file parent is not a directory: {token_dir}",
-            file=sys.stderr,
-        )
-        sys.exit(1)
-
     stage_account = extract_account_id_from_arn(args.stage_arn)
     if stage_account is None:
         print(
@@ -255,21 +504,64 @@ def main():
         print("ERROR: duration-minutes must be between 1 and 20160.", file=sys.stderr)
         sys.exit(1)
 
-    safety_margin = 0 if args.no_safety_margin else 300
+    if not 0 < args.proactive_fraction <= 1:
+        print("ERROR: proactive-fraction must be in (0, 1].", file=sys.stderr)
+        sys.exit(1)
+
+    if args.jitter_seconds < 0:
+        print("ERROR: jitter-seconds must be >= 0.", file=sys.stderr)
+        sys.exit(1)
+
+    # Refresh proactively (e.g. at 80% of the token lifetime) so consumers never
+    # wait on a synchronous refresh; jitter avoids every box refreshing at once.
+    if args.no_safety_margin:
+        safety_margin = 0
+    else:
+        safety_margin = max(
+            300,
+            (1 - args.proactive_fraction) * args.duration_minutes * 60
+            + random.uniform(0, args.jitter_seconds),
+        )
+    print(f"Refreshing if token expires within {safety_margin:.0f}s.")
+
+    # Fast path: token file unchanged since we last saw it and not near expiry.
+    if st is not None:
+        exp_ts = load_cached_expiry(token_path, st.st_mtime_ns)
+        if exp_ts is not None and time.time() + safety_margin < exp_ts:
+            print("Existing token is still valid; no refresh needed.")
+            return
 
     meta, old_raw = load_existing_token(token_path)
+    if meta and st is not None:
+        store_cached_expiry(token_path, st.st_mtime_ns, meta)
     if meta and is_token_valid(meta, safety_margin_seconds=safety_margin):
         # Already good, nothing to do
         print("Existing token is still valid; no refresh needed.")
         print("Token:", meta["token"])
         return
 
+    # Re-check under the lock: another process may have refreshed the token
+    # since our check above, whether or not we had to wait for it.
+    acquire_refresh_lock(token_path)
+    meta, old_raw = load_existing_token(token_path)
+    if meta and is_token_valid(meta, safety_margin_seconds=safety_margin):
+        print("Token was refreshed by another process; no refresh needed.")
+        return
+
     # Need a new token
     print("Existing token missing/invalid/expired; creating a new one...")
 
-    capabilities = args.capability
-    if not capabilities:
-        capabilities = ["PUBLISH", "SUBSCRIBE"]
+    capabilities = tuple(args.capability) if args.capability else _DEFAULT_CAPS
+
+    try:
+        import boto3  # noqa: F401  (used lazily by _session)
+        from botocore.exceptions import BotoCoreError, ClientError
+    except ImportError as e:
+        print(
+            f"ERROR: boto3/botocore not available (install requirements.txt): {e}",
+            file=sys.stderr,
+        )
+        sys.exit(2)
 
     try:
         pt = create_new_token(
@@ -292,9 +584,16 @@ def main():
             )
         sys.exit(2)
 
-    # Backup old file (if existed), then write new one
-    backup_old_file(token_path, old_raw)
-    write_new_token(token_path, args.stage_arn, pt)
+    # A valid-but-expired token is simply replaced atomically; only keep a backup
+    # of unrecognised (legacy/corrupt) contents that would otherwise be lost.
+    if meta is None and old_raw is not None:
+        backup_old_file(token_path, old_raw)
+    try:
+        meta = write_new_token(token_path, args.stage_arn, pt)
+    except OSError as e:
+        print(f"ERROR: Failed to write token file {token_path}: {e}", file=sys.stderr)
+        sys.exit(1)
+    store_cached_expiry(token_path, token_path.stat().st_mtime_ns, meta)
 
     print(f"New token written to {token_path}")
     print("Token:", pt["token"])
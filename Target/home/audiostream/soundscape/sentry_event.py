@@ -11,6 +11,8 @@ Configuration is via environment variables:
 - SENTRY_ENVIRONMENT (optional)
 - SENTRY_RELEASE (optional)
 - SENTRY_SERVER_NAME (optional)
+- SENTRY_FORCE_SEND (optional; also send info/warning events, which are
+  dropped by default to keep hook latency low)
 
 This intentionally does not automatically capture all local vars/env;
 use --extra/--tag explicitly from callers.
@@ -18,11 +20,15 @@ use --extra/--tag explicitly from callers.
 
 from __future__ import annotations
 
-import argparse
 import os
+import re
 import sys
 from typing import Dict, List, Optional
 
+# Basic secret scrubbing: callers should avoid passing secrets, but also defend here.
+# Matches on the tag/extra *key*, e.g. "ivs_token" or "Authorization".
+_SECRET_KEY = re.compile(r"(?i)token|authorization|secret|password|api[_-]?key|bearer")
+
 
 def _parse_kv_list(items: Optional[List[str]]) -> Dict[str, str]:
     out: Dict[str, str] = {}
@@ -47,6 +53,14 @@ def _bool_env(name: str, default: bool = False) -> bool:
 
 
 def main() -> int:
+    dsn = os.getenv("SENTRY_DSN")
+    if not dsn:
+        # Silently no-op when Sentry isn't configured; skip argparse entirely
+        # since most hook invocations on unconfigured boxes end here.
+        return 0
+
+    import argparse
+
     parser = argparse.ArgumentParser(description="Send a Sentry event from CLI")
     parser.add_argument("--level", default="error", choices=["fatal", "error", "warning", "info"])
     parser.add_argument("--message", required=True, help="Event message")
@@ -58,9 +72,8 @@ def main() -> int:
 
     args = parser.parse_args()
 
-    dsn = os.getenv("SENTRY_DSN")
-    if not dsn:
-        # Silently no-op when Sentry isn't configured.
+    # info/warning are low value relative to the SDK init + flush cost.
+    if args.level in ("info", "warning") and not _bool_env("SENTRY_FORCE_SEND"):
         return 0
 
     try:
@@ -79,24 +92,23 @@ def main() -> int:
         traces_sample_rate=0.0,
         send_default_pii=False,
         max_breadcrumbs=20,
+        # We flush explicitly below; don't wait again (or print the atexit
+        # "pending events" notice to the journal) at interpreter exit.
+        shutdown_timeout=0,
     )
 
     tags = _parse_kv_list(args.tag)
     extras = _parse_kv_list(args.extra)
 
-    # Basic secret scrubbing: callers should avoid passing secrets, but also defend here.
-    def _scrub(s: str) -> str:
-        lowered = s.lower()
-        if "token" in lowered or "authorization" in lowered or "secret" in lowered:
-            return "[redacted]"
-        return s
+    def _scrub(k: str, v: str) -> str:
+        return "[redacted]" if _SECRET_KEY.search(k) else v
 
     with sentry_sdk.new_scope() as scope:
         scope.set_tag("component", "soundscape")
         for k, v in tags.items():
-            scope.set_tag(k, _scrub(v))
+            scope.set_tag(k, _scrub(k, v))
         for k, v in extras.items():
-            scope.set_extra(k, _scrub(v))
+            scope.set_extra(k, _scrub(k, v))
         if args.fingerprint:
             scope.fingerprint = args.fingerprint
         if args.attach and os.path.exists(args.attach):
@@ -113,7 +125,9 @@ def main() -> int:
             message=args.message,
             level=args.level,
         )
-        sentry_sdk.flush(timeout=2.0)
+        # Give real failures time to get out over a flaky link; keep low-value
+        # events from stalling the caller.
+        sentry_sdk.flush(timeout=2.0 if args.level in ("fatal", "error") else 0.5)
 
     return 0
 
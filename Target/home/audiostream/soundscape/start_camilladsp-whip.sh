@@ -298,7 +298,8 @@ fi
 trap '' HUP
 
 # Major lifecycle event: supervisor start.
-sentry_send info "soundscape supervisor started" \
+# info/warning events are dropped by sentry_event.py unless forced.
+SENTRY_FORCE_SEND=1 sentry_send info "soundscape supervisor started" \
   "gst_debug=$GST_DEBUG" || true
 
 on_error() {
@@ -381,7 +382,7 @@ cleanup() {
   log "Shutting down… (reason=$reason)"
 
   # Major lifecycle event: supervisor stop.
-  sentry_send info "soundscape supervisor stopping" \
+  SENTRY_FORCE_SEND=1 sentry_send info "soundscape supervisor stopping" \
     "reason=$reason" || true
 
   kill -TERM "$CAMILLA_PID" 2>/dev/null || true
@@ -451,7 +452,7 @@ while true; do
 
     # Escalate if we're flapping.
     if (( whip_fail_count >= 5 )); then
-      sentry_send warning "whip-client repeatedly failing" "fail_count=$whip_fail_count" || true
+      SENTRY_FORCE_SEND=1 sentry_send warning "whip-client repeatedly failing" "fail_count=$whip_fail_count" || true
       whip_fail_count=0
     fi
   else